@@ -1,52 +1,45 @@
 import sys
 import os
-import base64
 import cv2
 import numpy as np # Explicit import for ndarray check
-from fastapi import FastAPI, HTTPException, UploadFile, File
+from fastapi import FastAPI, HTTPException, Request, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from pydantic import BaseModel, TypeAdapter
 from datetime import date
-import tempfile
 import traceback
 from typing import Optional, List, Dict # Cleaned up Optional import
 
-sys.path.append('..')
-from detection.score import analyze_skin_image
-from correlation import analyse_acne_corr
-# --- Rename 'profile.py' to 'user_profile.py' in your file system ---
-# Then change the import below:
-try:
-    from ..db.user_profile_db import init_db, save_profile_to_db, get_profile_from_db
-except ImportError:
-    print("ERROR: Could not import from 'user_profile_db'.")
-
 # --- Path Setup ---
 # Get the directory containing the 'api' folder (assumes api.py is in 'src/api/')
 SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 # Get the directory containing the 'src' folder (the 'back' directory)
 BACK_DIR = os.path.abspath(os.path.join(SRC_DIR, '..'))
 
-# Add 'back' directory to sys.path to allow imports like 'tsa.module', 'detection.module'
-# Only add if not already present to avoid duplicates
-if BACK_DIR not in sys.path:
-    sys.path.insert(0, BACK_DIR)
-    print(f"Added '{BACK_DIR}' to sys.path")
+# Add 'src' directory to sys.path once, before any local import, to allow imports like 'db.module', 'detection.module'
+if SRC_DIR not in sys.path:
+    sys.path.insert(0, SRC_DIR)
+
+# --- Import local modules with error handling ---
+try:
+    from db.user_profile_db import init_db, save_profile_to_db, get_profile_from_db
+except ImportError as e:
+    print(f"ERROR: Could not import from 'user_profile_db'. Details: {e}")
+    init_db = save_profile_to_db = get_profile_from_db = None
 
-# --- Import other local modules wwith error handling ---
 try:
-    # Assuming analyze_acne_data is in 'back/tsa/analyse_acne_corr.py'
+    # Assuming analyze_acne_data is in 'src/correlation/analyse_acne_corr.py'
     from correlation.analyse_acne_corr import analyze_acne_data
 except ImportError as e:
-    print(f"ERROR: Could not import 'analyze_acne_data' from 'tsa'. Check path and file. Details: {e}")
+    print(f"ERROR: Could not import 'analyze_acne_data' from 'correlation'. Check path and file. Details: {e}")
     analyze_acne_data = None
 
 try:
-    # Assuming analyze_skin_image is in 'back/detection/score.py'
-    from detection.score import analyze_skin_image
+    # Assuming analyze_skin_image is in 'src/detection/score.py'
+    from detection.score import analyze_skin_image, load_model, encode_heatmap_base64, resize_image, HEATMAP_MEDIA_TYPE
 except ImportError as e:
     print(f"ERROR: Could not import 'analyze_skin_image' from 'detection.score'. Check path and file. Details: {e}")
     analyze_skin_image = None # Set to None if import fails
+    load_model = None
 
 # --- FastAPI App Initialization ---
 app = FastAPI(title="Acne Tracker Analysis API")
@@ -73,12 +66,29 @@ except Exception as e:
 # --- Configuration ---
 # Model path relative to the 'back' directory
 MODEL_WEIGHTS_PATH = os.path.join(BACK_DIR,'src','detection', 'best.pt')
+# Upload limits, same values as src/api/config/settings.py
+MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
+UPLOAD_CHUNK_SIZE = 64 * 1024  # 64KB
 
 if not os.path.exists(MODEL_WEIGHTS_PATH):
     print(f"WARNING: Model file not found at expected path: {MODEL_WEIGHTS_PATH}")
     # Depending on requirements, you might want to raise an error here
 
 
+# --- Load Detection Model Once ---
+@app.on_event("startup")
+async def load_detection_model():
+    # Reusing one model instance avoids rebuilding YOLO on every /detect call
+    app.state.yolo = None
+    if load_model and os.path.exists(MODEL_WEIGHTS_PATH):
+        try:
+            app.state.yolo = load_model(MODEL_WEIGHTS_PATH)
+            print("Detection model loaded.")
+        except Exception as e:
+            print(f"ERROR loading detection model: {e}")
+            traceback.print_exc()
+
+
 # ---------------------------
 # Pydantic Models (Keep as they were)
 # ---------------------------
@@ -106,9 +116,13 @@ class DetectionResponse(BaseModel):
     average_intensity: Optional[float] = None
     lesion_count: Optional[int] = None
     heatmap_image_base64: Optional[str] = None
+    heatmap_media_type: Optional[str] = None # Format of heatmap_image_base64, e.g. image/webp
     detections: Optional[List[DetectionInfo]] = None
     model_classes: Optional[Dict[int, str]] = None
 
+# Validates the whole detection list in one pydantic-core call
+_DETECTIONS_ADAPTER = TypeAdapter(List[DetectionInfo])
+
 
 # ---------------------------
 # API Endpoints
@@ -171,8 +185,32 @@ async def analyze_endpoint(): # Renamed function slightly
         raise HTTPException(status_code=500, detail=f"Failed during correlation analysis: {str(e)}")
 
 
+def file_too_large_error():
+    # Same status and message as FileTooLargeError in the main app
+    return HTTPException(
+        status_code=413, # Payload Too Large
+        detail=f"Uploaded file is too large. Maximum size is {MAX_FILE_SIZE // (1024 * 1024)}MB."
+    )
+
+async def read_upload_capped(request: Request, file: UploadFile) -> bytearray:
+    """Reads the upload in chunks and rejects it with 413 as soon as it exceeds MAX_FILE_SIZE."""
+    content_length = request.headers.get('content-length')
+    if content_length and content_length.isdigit() and int(content_length) > MAX_FILE_SIZE + UPLOAD_CHUNK_SIZE:
+        # Allow one chunk of slack for the multipart framing around the file
+        raise file_too_large_error()
+    if file.size is not None and file.size > MAX_FILE_SIZE:
+        raise file_too_large_error()
+
+    content = bytearray()
+    while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+        content.extend(chunk)
+        if len(content) > MAX_FILE_SIZE:
+            raise file_too_large_error()
+    return content
+
+
 @app.post("/detect", response_model=DetectionResponse, summary="Detect skin conditions and score severity")
-async def detect_skin_conditions(file: UploadFile = File(..., description="Image file for analysis (JPEG, PNG, BMP)")):
+async def detect_skin_conditions(request: Request, file: UploadFile = File(..., description="Image file for analysis (JPEG, PNG, BMP)")):
     """
     Accepts an image file, performs skin condition detection using a YOLOv8 model,
     calculates a severity score (using AcneAI formula based logic),
@@ -192,38 +230,33 @@ async def detect_skin_conditions(file: UploadFile = File(..., description="Image
             detail=f"Invalid file type '{file.content_type}'. Please upload JPG, PNG, or BMP."
         )
 
-    temp_image_path = None # Initialize for finally block
     try:
-        # --- 2. Save Uploaded File Temporarily ---
-        # Using delete=False and manual deletion in finally is necessary
-        # because analyze_skin_image needs the path to exist when called.
-        with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename)[1]) as temp_image_file:
-            content = await file.read()
-            if not content:
-                 raise HTTPException(status_code=400, detail="Received empty file content.")
-            temp_image_file.write(content)
-            temp_image_path = temp_image_file.name
-        print(f"Temporary image saved to: {temp_image_path}")
-
-        # --- 2.1 Resize Image to 640x640 ---
-        img = cv2.imread(temp_image_path)
+        # --- 2. Read Uploaded File Into Memory (capped at MAX_FILE_SIZE) ---
+        content = await read_upload_capped(request, file)
+        if not content:
+             raise HTTPException(status_code=400, detail="Received empty file content.")
+
+        # --- 2.1 Decode and Resize Image to 640x640 ---
+        # Decoding straight from the upload buffer avoids a temp file round-trip
+        img = cv2.imdecode(np.frombuffer(content, dtype=np.uint8), cv2.IMREAD_COLOR)
         if img is None:
             raise HTTPException(status_code=400, detail="Could not read the uploaded image.")
-        resized_img = cv2.resize(img, (640, 640))
-        cv2.imwrite(temp_image_path, resized_img)
+        resized_img = resize_image(img, 640)
         print("Image resized to 640x640")
 
-        # --- 3. Verify Model File Exists ---
+        # --- 3. Verify Model Is Loaded ---
         # Check just before potentially long analysis step
-        if not os.path.exists(MODEL_WEIGHTS_PATH):
-             print(f"CRITICAL ERROR: Model file missing at analysis time: {MODEL_WEIGHTS_PATH}")
+        # The weights were checked once at startup; only the in-memory model matters here
+        model = getattr(request.app.state, 'yolo', None)
+        if model is None:
+             print(f"CRITICAL ERROR: Model not loaded, check startup logs for: {MODEL_WEIGHTS_PATH}")
              raise HTTPException(status_code=503, detail="Required analysis model file is currently unavailable.")
 
         # --- 4. Call Analysis Function ---
         # This now uses the version of analyze_skin_image calling calculate_acneai_score
         analysis_results = analyze_skin_image(
-            model_path=MODEL_WEIGHTS_PATH,
-            image_path=temp_image_path
+            model=model,
+            image=resized_img
             # Pass other parameters like conf_threshold if needed:
             # conf_threshold=0.3,
             # severity_map=CUSTOM_MAP, # etc.
@@ -233,19 +266,11 @@ async def detect_skin_conditions(file: UploadFile = File(..., description="Image
         # Re-raise specific HTTP exceptions (e.g., 400, 415, 503)
         raise e
     except Exception as e:
-        # Catch unexpected errors during file/analysis
-        print(f"Error during file handling or analysis call for {file.filename}: {e}")
+        # Catch unexpected errors during decoding/analysis
+        print(f"Error during image decoding or analysis call for {file.filename}: {e}")
         traceback.print_exc()
         # Return a generic 500 error to the client
         raise HTTPException(status_code=500, detail="An error occurred while processing the image.")
-    finally:
-        # --- 5. Cleanup Temporary File ---
-        if temp_image_path and os.path.exists(temp_image_path):
-            try:
-                os.remove(temp_image_path)
-                print(f"Temporary image deleted: {temp_image_path}")
-            except OSError as e:
-                 print(f"Error deleting temporary file {temp_image_path}: {e}") # Log cleanup error but don't fail request
 
     # --- 6. Process Analysis Results ---
     if not analysis_results or not analysis_results.get('success'):
@@ -261,9 +286,8 @@ async def detect_skin_conditions(file: UploadFile = File(..., description="Image
     heatmap_data = analysis_results.get('heatmap_overlay_bgr')
     if heatmap_data is not None and isinstance(heatmap_data, np.ndarray):
         try:
-            success, buffer = cv2.imencode('.png', heatmap_data) # Use PNG for lossless overlay
-            if success:
-                heatmap_base64 = base64.b64encode(buffer).decode('utf-8')
+            heatmap_base64 = encode_heatmap_base64(heatmap_data) # Lossy WebP is fine for a visualization
+            if heatmap_base64:
                 print("Heatmap image successfully encoded to Base64.")
             else:
                  print("Warning: cv2.imencode failed for heatmap.") # Log warning
@@ -283,8 +307,9 @@ async def detect_skin_conditions(file: UploadFile = File(..., description="Image
         average_intensity=analysis_results.get('average_intensity'),
         lesion_count=analysis_results.get('lesion_count'),
         heatmap_image_base64=heatmap_base64, # Include encoded heatmap string
+        heatmap_media_type=HEATMAP_MEDIA_TYPE if heatmap_base64 else None,
         # Convert list of detection dicts to list of Pydantic models
-        detections=[DetectionInfo(**det) for det in analysis_results.get('detections', [])],
+        detections=_DETECTIONS_ADAPTER.validate_python(analysis_results.get('detections', [])),
         model_classes=analysis_results.get('model_classes')
     )
     return response_data
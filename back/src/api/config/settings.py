@@ -6,10 +6,19 @@ BASE_DIR = Path(__file__).resolve().parent.parent.parent
 BACK_DIR = BASE_DIR.parent
 
 # Model paths
-MODEL_WEIGHTS_PATH = os.path.join(BACK_DIR, 'src', 'detection', 'best.pt')
+# Prefer the int8 ONNX export (see src/detection/export.py) when it has been generated
+PYTORCH_WEIGHTS_PATH = os.path.join(BACK_DIR, 'src', 'detection', 'best.pt')
+QUANTIZED_WEIGHTS_PATH = os.path.join(BACK_DIR, 'src', 'detection', 'best_int8.onnx')
+MODEL_WEIGHTS_PATH = QUANTIZED_WEIGHTS_PATH if os.path.exists(QUANTIZED_WEIGHTS_PATH) else PYTORCH_WEIGHTS_PATH
+
+# Detection batching settings
+DETECTION_MAX_BATCH = 8
+DETECTION_MAX_WAIT = 0.01  # seconds to wait for more images before running a batch
+DETECTION_CACHE_SIZE = 128  # responses kept for re-submitted images
 
 # Database paths
 DB_PATH = os.path.join(BACK_DIR, 'tsa', 'acne_tracker.db')
+DB_POOL_SIZE = 8
 
 # API settings
 ALLOWED_ORIGINS = [
@@ -20,6 +29,7 @@ ALLOWED_ORIGINS = [
 # File upload settings
 ALLOWED_FILE_TYPES = ["image/jpeg", "image/png", "image/bmp"]
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
+UPLOAD_CHUNK_SIZE = 64 * 1024  # 64KB
 
 # Security settings
 API_PREFIX = "/api/v1" 
\ No newline at end of file
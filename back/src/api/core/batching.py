@@ -0,0 +1,81 @@
+import asyncio
+from concurrent.futures import Executor
+from typing import List, Optional, Tuple, Union
+import numpy as np
+import torch
+
+class InferenceBatcher:
+    """
+    Collects images from concurrent requests and runs them through the
+    model as a single batched predict call.
+    """
+
+    def __init__(self, model, max_batch: int = 8, max_wait: float = 0.01, conf: float = 0.25,
+                 executor: Optional[Executor] = None):
+        self.model = model
+        self.executor = executor
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.conf = conf
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the background batching loop"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Cancel the background batching loop"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def submit(self, image: Union[np.ndarray, torch.Tensor]) -> list:
+        """Queue an image and wait for its prediction results"""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((image, future))
+        return await future
+
+    async def _collect(self) -> List[Tuple[Union[np.ndarray, torch.Tensor], asyncio.Future]]:
+        """Wait for one item, then gather more until the batch is full or the window closes"""
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    def _predict(self, images: list) -> list:
+        # Device tensors (1x3xHxW) are concatenated into one batch, arrays go as a list
+        source = torch.cat(images) if isinstance(images[0], torch.Tensor) else images
+        return self.model.predict(source=source, conf=self.conf, verbose=False)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            images = [image for image, _ in batch]
+            try:
+                # Only this loop calls the model, one batch at a time, so no lock is needed
+                predictions = await loop.run_in_executor(self.executor, self._predict, images)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            # Each caller gets a one-element list, matching a single-image predict call
+            for (_, future), prediction in zip(batch, predictions):
+                if not future.done():
+                    future.set_result([prediction])
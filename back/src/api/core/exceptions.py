@@ -14,6 +14,20 @@ class InvalidFileTypeError(HTTPException):
             detail=f"Invalid file type '{content_type}'. Please upload JPG, PNG, or BMP."
         )
 
+class FileTooLargeError(HTTPException):
+    def __init__(self, max_size: int):
+        super().__init__(
+            status_code=413,
+            detail=f"Uploaded file is too large. Maximum size is {max_size // (1024 * 1024)}MB."
+        )
+
+class InvalidImageError(HTTPException):
+    def __init__(self):
+        super().__init__(
+            status_code=400,
+            detail="Could not read the uploaded image."
+        )
+
 class DatabaseError(HTTPException):
     def __init__(self, detail: str):
         super().__init__(
@@ -1,8 +1,14 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from src.api.config.settings import ALLOWED_ORIGINS, API_PREFIX
+from src.api.config.settings import ALLOWED_ORIGINS, API_PREFIX, MODEL_WEIGHTS_PATH, DETECTION_MAX_BATCH, DETECTION_MAX_WAIT, DETECTION_CACHE_SIZE, DB_POOL_SIZE
+from src.api.core.batching import InferenceBatcher
 from src.api.routes import profile, detection, analysis, skin_plan, timeseries
-from src.db.user_profile_db import init_db
+from aiosqlitepool import SQLiteConnectionPool
+from cachetools import LRUCache
+from src.db.user_profile_db import init_db, create_async_connection
+from src.detection.score import load_model, DEFAULT_CONFIDENCE_THRESHOLD
 
 app = FastAPI(
     title="Acne Tracker Analysis API",
@@ -22,6 +28,47 @@ app.add_middleware(
 # Initialize database
 init_db()
 
+@app.on_event("startup")
+async def open_db_pool():
+    # Reuse warm SQLite connections instead of opening one per request
+    app.state.pool = SQLiteConnectionPool(create_async_connection, pool_size=DB_POOL_SIZE)
+
+@app.on_event("shutdown")
+async def close_db_pool():
+    await app.state.pool.close()
+
+@app.on_event("startup")
+async def load_detection_model():
+    # Bounded pool for decoding, inference and heatmap rendering
+    app.state.executor = ThreadPoolExecutor(max_workers=os.cpu_count())
+
+    # Fail fast if the weights are missing; requests only use the loaded model after this
+    if not os.path.exists(MODEL_WEIGHTS_PATH):
+        raise FileNotFoundError(f"Model file not found: {MODEL_WEIGHTS_PATH}")
+
+    # Load the YOLO model once and share it across requests
+    app.state.yolo = load_model(MODEL_WEIGHTS_PATH)
+
+    # Concurrent /detect requests are grouped into one predict call
+    app.state.batcher = InferenceBatcher(
+        app.state.yolo,
+        max_batch=DETECTION_MAX_BATCH,
+        max_wait=DETECTION_MAX_WAIT,
+        conf=DEFAULT_CONFIDENCE_THRESHOLD,
+        executor=app.state.executor
+    )
+    app.state.batcher.start()
+
+    # Responses keyed by upload hash, so re-submitted photos skip the whole pipeline
+    app.state.cache = LRUCache(maxsize=DETECTION_CACHE_SIZE)
+
+@app.on_event("shutdown")
+async def stop_detection_batcher():
+    if getattr(app.state, 'batcher', None) is not None:
+        await app.state.batcher.stop()
+    if getattr(app.state, 'executor', None) is not None:
+        app.state.executor.shutdown(wait=False)
+
 # Include routers
 app.include_router(profile.router, prefix=API_PREFIX)
 app.include_router(detection.router, prefix=API_PREFIX)
@@ -22,6 +22,7 @@ class DetectionResponse(BaseModel):
     average_intensity: Optional[float] = None
     lesion_count: Optional[int] = None
     heatmap_image_base64: Optional[str] = None
+    heatmap_media_type: Optional[str] = None # Format of heatmap_image_base64, e.g. image/webp
     detections: Optional[List[DetectionInfo]] = None
     model_classes: Optional[Dict[int, str]] = None
 
@@ -1,4 +1,5 @@
-from fastapi import APIRouter
+import asyncio
+from fastapi import APIRouter, Request
 from src.api.models.schemas import AnalysisResponse
 from src.api.core.exceptions import AnalysisError
 from src.api.config.settings import DB_PATH
@@ -8,12 +9,15 @@ import os
 router = APIRouter(prefix="/analyze", tags=["analysis"])
 
 @router.get("/", response_model=AnalysisResponse)
-async def analyze_data():
+async def analyze_data(request: Request):
     if not os.path.exists(DB_PATH):
         raise AnalysisError(f"Database file not found at required path: {DB_PATH}")
 
     try:
-        correlations, summary = analyze_acne_data(DB_PATH)
+        # pandas needs a blocking sqlite3 connection, so run the analysis on the worker pool
+        loop = asyncio.get_running_loop()
+        executor = getattr(request.app.state, 'executor', None)
+        correlations, summary = await loop.run_in_executor(executor, analyze_acne_data, DB_PATH)
         return {"correlations": correlations, "summary": summary}
     except Exception as e:
         raise AnalysisError(str(e)) 
\ No newline at end of file
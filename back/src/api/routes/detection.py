@@ -1,66 +1,106 @@
-import os
-import base64
+import asyncio
 import cv2
 import numpy as np
-from fastapi import APIRouter, UploadFile, File
+import xxhash
+from typing import List
+from pydantic import TypeAdapter
+from fastapi import APIRouter, HTTPException, Request, UploadFile, File
 from src.api.models.schemas import DetectionResponse, DetectionInfo
-from src.api.core.exceptions import ModelNotAvailableError, InvalidFileTypeError, AnalysisError
-from src.api.config.settings import MODEL_WEIGHTS_PATH, ALLOWED_FILE_TYPES
-from src.detection.score import analyze_skin_image
-import tempfile
+from src.api.core.exceptions import ModelNotAvailableError, InvalidFileTypeError, InvalidImageError, FileTooLargeError, AnalysisError
+from src.api.config.settings import ALLOWED_FILE_TYPES, MAX_FILE_SIZE, UPLOAD_CHUNK_SIZE
+from src.detection.score import analyze_skin_image, encode_heatmap_base64, prepare_model_input, HEATMAP_MEDIA_TYPE
 
 router = APIRouter(prefix="/detect", tags=["detection"])
 
+# Validates the whole detection list in one pydantic-core call
+_DETECTIONS_ADAPTER = TypeAdapter(List[DetectionInfo])
+
+async def _read_upload(request: Request, file: UploadFile) -> bytearray:
+    """Read the upload in chunks, rejecting it as soon as it exceeds MAX_FILE_SIZE"""
+    content_length = request.headers.get('content-length')
+    if content_length and content_length.isdigit() and int(content_length) > MAX_FILE_SIZE + UPLOAD_CHUNK_SIZE:
+        # Allow one chunk of slack for the multipart framing around the file
+        raise FileTooLargeError(MAX_FILE_SIZE)
+    if file.size is not None and file.size > MAX_FILE_SIZE:
+        raise FileTooLargeError(MAX_FILE_SIZE)
+
+    content = bytearray()
+    while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+        content.extend(chunk)
+        if len(content) > MAX_FILE_SIZE:
+            raise FileTooLargeError(MAX_FILE_SIZE)
+    return content
+
+def _decode_image(content: bytes, device=None):
+    """Decode and resize the upload in memory, on the model's device when it is a GPU"""
+    img = cv2.imdecode(np.frombuffer(content, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        raise InvalidImageError()
+    return prepare_model_input(img, device=device)
+
+def _build_response(model, image: np.ndarray, predict_results: list) -> DetectionResponse:
+    """Score the predictions, render the heatmap and encode it for the response"""
+    analysis_results = analyze_skin_image(
+        model=model,
+        image=image,
+        predict_results=predict_results
+    )
+
+    if not analysis_results or not analysis_results.get('success'):
+        raise AnalysisError(analysis_results.get('message', 'Unknown analysis error'))
+
+    # Process heatmap image
+    heatmap_base64 = None
+    heatmap_data = analysis_results.get('heatmap_overlay_bgr')
+    if heatmap_data is not None and isinstance(heatmap_data, np.ndarray):
+        heatmap_base64 = encode_heatmap_base64(heatmap_data)
+
+    return DetectionResponse(
+        success=True,
+        message=analysis_results.get('message', 'Analysis successful.'),
+        severity_score=analysis_results.get('severity_score'),
+        percentage_area=analysis_results.get('percentage_area'),
+        average_intensity=analysis_results.get('average_intensity'),
+        lesion_count=analysis_results.get('lesion_count'),
+        heatmap_image_base64=heatmap_base64,
+        heatmap_media_type=HEATMAP_MEDIA_TYPE if heatmap_base64 else None,
+        detections=_DETECTIONS_ADAPTER.validate_python(analysis_results.get('detections', [])),
+        model_classes=analysis_results.get('model_classes')
+    )
+
 @router.post("/", response_model=DetectionResponse)
-async def detect_skin_conditions(file: UploadFile = File(...)):
+async def detect_skin_conditions(request: Request, file: UploadFile = File(...)):
     if file.content_type not in ALLOWED_FILE_TYPES:
         raise InvalidFileTypeError(file.content_type)
 
-    if not os.path.exists(MODEL_WEIGHTS_PATH):
+    model = getattr(request.app.state, 'yolo', None)
+    batcher = getattr(request.app.state, 'batcher', None)
+    if model is None or batcher is None:
         raise ModelNotAvailableError()
 
-    temp_image_path = None
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(file.filename)[1]) as temp_file:
-            content = await file.read()
-            if not content:
-                raise AnalysisError("Received empty file content")
-            temp_file.write(content)
-            temp_image_path = temp_file.name
-
-        analysis_results = analyze_skin_image(
-            model_path=MODEL_WEIGHTS_PATH,
-            image_path=temp_image_path
-        )
-
-        if not analysis_results or not analysis_results.get('success'):
-            raise AnalysisError(analysis_results.get('message', 'Unknown analysis error'))
-
-        # Process heatmap image
-        heatmap_base64 = None
-        heatmap_data = analysis_results.get('heatmap_overlay_bgr')
-        if heatmap_data is not None and isinstance(heatmap_data, np.ndarray):
-            success, buffer = cv2.imencode('.png', heatmap_data)
-            if success:
-                heatmap_base64 = base64.b64encode(buffer).decode('utf-8')
-
-        return DetectionResponse(
-            success=True,
-            message=analysis_results.get('message', 'Analysis successful.'),
-            severity_score=analysis_results.get('severity_score'),
-            percentage_area=analysis_results.get('percentage_area'),
-            average_intensity=analysis_results.get('average_intensity'),
-            lesion_count=analysis_results.get('lesion_count'),
-            heatmap_image_base64=heatmap_base64,
-            detections=[DetectionInfo(**det) for det in analysis_results.get('detections', [])],
-            model_classes=analysis_results.get('model_classes')
-        )
+        content = await _read_upload(request, file)
+        if not content:
+            raise AnalysisError("Received empty file content")
+
+        # Identical uploads get the stored response without decoding or inference
+        cache = getattr(request.app.state, 'cache', None)
+        cache_key = xxhash.xxh3_64_hexdigest(content)
+        if cache is not None and cache_key in cache:
+            return DetectionResponse.model_validate(cache[cache_key])
+
+        # Keep the CPU-bound steps off the event loop so requests can overlap
+        loop = asyncio.get_running_loop()
+        executor = getattr(request.app.state, 'executor', None)
+        model_input, resized_img = await loop.run_in_executor(executor, _decode_image, content, model.device)
+        predict_results = await batcher.submit(model_input)
+        response = await loop.run_in_executor(executor, _build_response, model, resized_img, predict_results)
+
+        if cache is not None:
+            cache[cache_key] = response.model_dump()
+        return response
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise AnalysisError(str(e))
-    finally:
-        if temp_image_path and os.path.exists(temp_image_path):
-            try:
-                os.remove(temp_image_path)
-            except OSError:
-                pass 
\ No newline at end of file
@@ -1,34 +1,37 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from typing import Optional
 from src.api.models.schemas import Profile
 from src.api.core.exceptions import DatabaseError
-from src.db.user_profile_db import save_profile_to_db, get_profile_from_db
+from src.db.user_profile_db import save_profile_async, get_profile_async
 
 router = APIRouter(prefix="/profile", tags=["profile"])
 
 @router.post("/")
-async def save_profile(profile: Profile):
+async def save_profile(request: Request, profile: Profile):
     try:
-        save_profile_to_db(
-            user_id=profile.user_id,
-            name=profile.name,
-            dob=profile.dob.isoformat(),
-            height=profile.height,
-            weight=profile.weight,
-            gender=profile.gender
-        )
+        async with request.app.state.pool.connection() as conn:
+            await save_profile_async(
+                conn,
+                user_id=profile.user_id,
+                name=profile.name,
+                dob=profile.dob.isoformat(),
+                height=profile.height,
+                weight=profile.weight,
+                gender=profile.gender
+            )
         return {"message": "Profile saved successfully"}
     except Exception as e:
         raise DatabaseError(str(e))
 
-@router.get("/{user_id}")
-async def get_profile(user_id: str):
+@router.get("/{user_id}", response_model=Profile)
+async def get_profile(request: Request, user_id: str):
     try:
-        profile_data = get_profile_from_db(user_id)
+        async with request.app.state.pool.connection() as conn:
+            profile_data = await get_profile_async(conn, user_id)
         if not profile_data:
             raise HTTPException(status_code=404, detail="Profile not found")
         return profile_data
     except HTTPException:
         raise
     except Exception as e:
-        raise DatabaseError(str(e)) 
\ No newline at end of file
+        raise DatabaseError(str(e))
\ No newline at end of file
@@ -1,4 +1,5 @@
 import sqlite3
+import aiosqlite
 from typing import Optional, Dict, Union
 import os
 from datetime import datetime
@@ -8,6 +9,25 @@ from datetime import datetime
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DB_PATH = os.path.join(BASE_DIR, "tsa", "acne_tracker.db")
 
+UPSERT_PROFILE_QUERY = '''
+    INSERT INTO user_profiles (user_id, name, dob, height, weight, gender)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(user_id) DO UPDATE SET
+        name=excluded.name,
+        dob=excluded.dob,
+        height=excluded.height,
+        weight=excluded.weight,
+        gender=excluded.gender
+'''
+SELECT_PROFILE_QUERY = "SELECT user_id, name, dob, height, weight, gender FROM user_profiles WHERE user_id = ?"
+
+# Applied to every pooled connection, see create_async_connection
+CONNECTION_PRAGMAS = [
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-20000",
+]
+
 class ValidationError(Exception):
     """Custom exception for validation errors"""
     pass
@@ -81,16 +101,7 @@ def save_profile_to_db(user_id: str, name: str, dob: str, height: float, weight:
     
     conn = get_db_connection(db_path)
     cursor = conn.cursor()
-    cursor.execute('''
-        INSERT INTO user_profiles (user_id, name, dob, height, weight, gender)
-        VALUES (?, ?, ?, ?, ?, ?)
-        ON CONFLICT(user_id) DO UPDATE SET
-            name=excluded.name,
-            dob=excluded.dob,
-            height=excluded.height,
-            weight=excluded.weight,
-            gender=excluded.gender
-    ''', (user_id, name, dob, height, weight, gender))
+    cursor.execute(UPSERT_PROFILE_QUERY, (user_id, name, dob, height, weight, gender))
     conn.commit()
     conn.close()
 
@@ -101,9 +112,12 @@ def get_profile_from_db(user_id: str, db_path: str = DB_PATH) -> Optional[Dict]:
         
     conn = get_db_connection(db_path)
     cursor = conn.cursor()
-    cursor.execute("SELECT user_id, name, dob, height, weight, gender FROM user_profiles WHERE user_id = ?", (user_id,))
+    cursor.execute(SELECT_PROFILE_QUERY, (user_id,))
     row = cursor.fetchone()
     conn.close()
+    return _row_to_profile(row)
+
+def _row_to_profile(row) -> Optional[Dict]:
     if row:
         return {
             "user_id": row[0],
@@ -113,4 +127,29 @@ def get_profile_from_db(user_id: str, db_path: str = DB_PATH) -> Optional[Dict]:
             "weight": row[4],
             "gender": row[5]
         }
-    return None 
\ No newline at end of file
+    return None
+
+async def create_async_connection(db_path: str = DB_PATH) -> aiosqlite.Connection:
+    """Open an aiosqlite connection tuned for reuse in a connection pool"""
+    conn = await aiosqlite.connect(db_path)
+    for pragma in CONNECTION_PRAGMAS:
+        await conn.execute(pragma)
+    return conn
+
+async def save_profile_async(conn: aiosqlite.Connection, user_id: str, name: str, dob: str,
+                             height: float, weight: float, gender: str):
+    """Save or update a user profile using an existing (pooled) connection"""
+    validate_profile_data(user_id, name, dob, height, weight, gender)
+
+    await conn.execute(UPSERT_PROFILE_QUERY, (user_id, name, dob, height, weight, gender))
+    await conn.commit()
+
+async def get_profile_async(conn: aiosqlite.Connection, user_id: str) -> Optional[Dict]:
+    """Retrieve a user profile using an existing (pooled) connection"""
+    if not isinstance(user_id, str) or not user_id:
+        raise ValidationError("user_id must be a non-empty string")
+
+    async with conn.execute(SELECT_PROFILE_QUERY, (user_id,)) as cursor:
+        row = await cursor.fetchone()
+    return _row_to_profile(row)
+ 
\ No newline at end of file
@@ -0,0 +1,71 @@
+import os
+import glob
+import cv2
+import numpy as np
+from ultralytics import YOLO
+from src.detection.score import resize_image
+
+#--- Configuration ---
+WEIGHTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'best.pt')
+CALIBRATION_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'calibration')
+OUTPUT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'best_int8.onnx')
+IMG_SIZE = 640
+MAX_CALIBRATION_IMAGES = 200
+# --- End Configuration ---
+
+
+def export_onnx(weights_path, img_size):
+    """Exports the YOLOv8 weights to FP32 ONNX with a dynamic batch axis (needed by the request batcher)."""
+    print(f"\n--- Exporting {weights_path} to ONNX ---")
+    model = YOLO(weights_path)
+    onnx_path = model.export(format='onnx', imgsz=img_size, dynamic=True, simplify=True)
+    print(f"ONNX model saved to: {onnx_path}")
+    return onnx_path
+
+
+def load_calibration_image(image_path, img_size):
+    """Preprocesses an image exactly like the API does: resize, BGR -> RGB, 0-1 float, NCHW."""
+    image = cv2.imread(image_path)
+    if image is None: return None
+    image = resize_image(image, img_size)
+    image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB).astype(np.float32) / 255.0
+    return image.transpose(2, 0, 1)[np.newaxis]
+
+
+def quantize_onnx(onnx_path, calibration_dir, output_path, img_size, max_images):
+    """Statically quantizes the ONNX model to int8 using representative skin images."""
+    from onnxruntime.quantization import CalibrationDataReader, QuantFormat, QuantType, quantize_static
+
+    image_paths = sorted(
+        p for ext in ('*.jpg', '*.jpeg', '*.png', '*.bmp') for p in glob.glob(os.path.join(calibration_dir, ext))
+    )[:max_images]
+    if not image_paths: raise FileNotFoundError(f"No calibration images found in: {calibration_dir}")
+    print(f"\n--- Quantizing to int8 with {len(image_paths)} calibration images ---")
+
+    class SkinImageReader(CalibrationDataReader):
+        def __init__(self):
+            self.paths = iter(image_paths)
+
+        def get_next(self):
+            for path in self.paths:
+                image = load_calibration_image(path, img_size)
+                if image is not None: return {'images': image}
+            return None
+
+    quantize_static(
+        onnx_path, output_path, SkinImageReader(),
+        quant_format=QuantFormat.QDQ, per_channel=True,
+        activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8
+    )
+    print(f"Quantized model saved to: {output_path}")
+    return output_path
+
+
+def main():
+    """Exports best.pt to ONNX and quantizes it to int8; the API loads OUTPUT_PATH when it exists."""
+    onnx_path = export_onnx(WEIGHTS_PATH, IMG_SIZE)
+    quantize_onnx(onnx_path, CALIBRATION_DIR, OUTPUT_PATH, IMG_SIZE, MAX_CALIBRATION_IMAGES)
+    print("\n--- Script Finished ---")
+
+if __name__ == "__main__":
+    main()
@@ -5,9 +5,9 @@ import numpy as np
 import matplotlib.pyplot as plt 
 import math 
 import traceback
-from scipy.ndimage import gaussian_filter
+import threading
 from ultralytics import YOLO
-import base64 
+import binascii
 
 # --- Default Configuration Constants ---
 DEFAULT_SEVERITY_SCORE_MAP = {
@@ -26,15 +26,47 @@ DEFAULT_GAUSSIAN_SPREAD_SIGMA = 90
 DEFAULT_SECONDARY_BLUR_KERNEL_SIZE = 0
 DEFAULT_SCORE_RANGE = (0, 100) # AcneAI score range
 DEFAULT_CONFIDENCE_THRESHOLD = 0.25
+DEFAULT_MODEL_INPUT_SIZE = 640
+DEFAULT_HEATMAP_ENCODE_QUALITY = 85 # WebP quality, the heatmap is a visualization so lossy is fine
+HEATMAP_MEDIA_TYPE = 'image/webp'
 
 # --- Helper Function Definitions ---
 
+def _gaussian_profiles(centers, length, sigma, truncate=4.0):
+    """
+    1-D Gaussian kernel centred on each point, shape (length, N).
+    Uses the same normalised, truncated kernel and 'reflect' borders as
+    scipy.ndimage.gaussian_filter, so summing profiles reproduces it exactly.
+    """
+    radius = int(truncate * float(sigma) + 0.5)
+    kernel = np.exp(-0.5 * (np.arange(-radius, radius + 1) / float(sigma)) ** 2); kernel /= kernel.sum()
+    coords = np.arange(length)[:, None]; profiles = np.zeros((length, len(centers)), dtype=np.float64)
+    # Reflect borders repeat every 2*length: a point at c has mirror images at c + 2kL and -1 - c + 2kL
+    n_periods = radius // (2 * length) + 1
+    for k in range(-n_periods, n_periods + 1):
+        for mirrored in (centers + 2 * k * length, -1 - centers + 2 * k * length):
+            d = coords - mirrored[None, :]; inside = np.abs(d) <= radius
+            profiles += np.where(inside, kernel[np.clip(d + radius, 0, 2 * radius)], 0.0)
+    return profiles
+
+
+def _accumulate_heatmap(ys, xs, weights, img_h, img_w, sigma):
+    """
+    Spreads weighted points into a (img_h, img_w) heatmap with a Gaussian of `sigma`.
+    The blur is separable and linear, so instead of blurring the whole image we sum
+    one outer product per point: (H x N) @ (N x W). Cost scales with the number of
+    detections rather than with kernel size times image area.
+    """
+    rows = _gaussian_profiles(ys, img_h, sigma); cols = _gaussian_profiles(xs, img_w, sigma)
+    return ((rows * weights[None, :]) @ cols.T).astype(np.float32)
+
+
 def generate_spread_heatmap(image, detection_results, severity_map, default_s_i,
                             weighting=DEFAULT_HEATMAP_WEIGHTING, alpha=DEFAULT_HEATMAP_ALPHA,
                             spread_sigma=DEFAULT_GAUSSIAN_SPREAD_SIGMA,
                             secondary_blur_ksize=DEFAULT_SECONDARY_BLUR_KERNEL_SIZE,
                             colormap=DEFAULT_COLORMAP):
-    """Generates a heatmap overlay. (Function body remains the same)"""
+    """Generates a heatmap overlay; the Gaussian spread is computed separably via `_accumulate_heatmap`."""
     if not isinstance(image, np.ndarray) or image.ndim != 3: return image, np.zeros(image.shape[:2] if isinstance(image, np.ndarray) else (100, 100), dtype=np.float32)
     if not detection_results or len(detection_results) == 0: return image, np.zeros(image.shape[:2], dtype=np.float32)
     try:
@@ -44,20 +76,20 @@ def generate_spread_heatmap(image, detection_results, severity_map, default_s_i,
     except (AttributeError, IndexError) as e: return image, np.zeros(image.shape[:2], dtype=np.float32)
     heatmap_raw = np.zeros((img_h, img_w), dtype=np.float32); num_detections = len(boxes) if boxes is not None else 0
     if num_detections > 0:
-        points_data = []
-        for box in boxes:
-             try:
-                x1, y1, x2, y2 = box.xyxy[0].cpu().numpy(); cx = max(0, min(img_w - 1, int((x1 + x2) / 2))); cy = max(0, min(img_h - 1, int((y1 + y2) / 2)))
-                point_weight = 1.0
-                if weighting == 'severity':
-                    class_id = int(box.cls[0]); class_name = names.get(class_id, f"class_{class_id}"); s_i = severity_map.get(class_name, default_s_i); point_weight = float(s_i)
-                elif weighting == 'confidence': point_weight = float(box.conf[0])
-                if point_weight > 0: points_data.append((cy, cx, point_weight))
-             except (AttributeError, IndexError, TypeError) as e: continue
-        if points_data:
-            for y, x, weight in points_data: heatmap_raw[y, x] += weight
-            if spread_sigma > 0: heatmap_spread = gaussian_filter(heatmap_raw, sigma=spread_sigma)
-            else: heatmap_spread = heatmap_raw
+        try:
+            # Pull all boxes off the device in one go instead of per box
+            xyxy = boxes.xyxy.cpu().numpy()
+            xs = np.clip(((xyxy[:, 0] + xyxy[:, 2]) / 2).astype(np.int64), 0, img_w - 1); ys = np.clip(((xyxy[:, 1] + xyxy[:, 3]) / 2).astype(np.int64), 0, img_h - 1)
+            if weighting == 'severity':
+                class_ids = boxes.cls.cpu().numpy().astype(int)
+                weights = np.array([float(severity_map.get(names.get(c, f"class_{c}"), default_s_i)) for c in class_ids], dtype=np.float64)
+            elif weighting == 'confidence': weights = boxes.conf.cpu().numpy().astype(np.float64)
+            else: weights = np.ones(len(xyxy), dtype=np.float64)
+            keep = weights > 0; ys, xs, weights = ys[keep], xs[keep], weights[keep]
+        except (AttributeError, IndexError, TypeError) as e: ys = xs = weights = np.zeros(0)
+        if len(weights) > 0:
+            if spread_sigma > 0: heatmap_spread = _accumulate_heatmap(ys, xs, weights, img_h, img_w, spread_sigma)
+            else: np.add.at(heatmap_raw, (ys, xs), weights); heatmap_spread = heatmap_raw
             if secondary_blur_ksize and secondary_blur_ksize > 1 and secondary_blur_ksize % 2 == 1: heatmap_blurred = cv2.GaussianBlur(heatmap_spread, (secondary_blur_ksize, secondary_blur_ksize), 0)
             else: heatmap_blurred = heatmap_spread
             max_val = np.max(heatmap_blurred)
@@ -73,7 +105,7 @@ def generate_spread_heatmap(image, detection_results, severity_map, default_s_i,
 
 def calculate_acneai_score(detection_results, image_shape, severity_map, default_s_i):
     """
-    Calculates score based on AcneAI paper (Eq 3). (Function body remains the same)
+    Calculates score based on AcneAI paper (Eq 3), reducing all boxes with vectorized NumPy ops.
     Returns: score_S, percentage_affected_area, average_intensity, N
     """
     score_range=(0, 100)
@@ -86,16 +118,15 @@ def calculate_acneai_score(detection_results, image_shape, severity_map, default
     except (AttributeError, IndexError) as e: return score_range[0], 0.0, 0.0, 0
     N_total_boxes = len(boxes) if boxes is not None else 0
     if N_total_boxes == 0 or A <= 0: return score_range[0], 0.0, 0.0, 0
-    sum_term = 0.0; total_lesion_area = 0.0; sum_severity_points = 0.0; valid_detections = 0
-    for box in boxes:
-         try:
-            x1, y1, x2, y2 = box.xyxy[0].cpu().numpy(); w = x2 - x1; h = y2 - y1
-            if w <= 0 or h <= 0: continue
-            a_i = float(w * h); total_lesion_area += a_i
-            class_id = int(box.cls[0]); class_name = names.get(class_id, f"class_{class_id}")
-            s_i = severity_map.get(class_name, default_s_i); sum_severity_points += s_i
-            sum_term += (s_i * a_i) / A; valid_detections += 1
-         except (AttributeError, IndexError, TypeError) as e: continue
+    try:
+        # Read all boxes in one transfer and reduce with NumPy instead of a per-box loop
+        xyxy = boxes.xyxy.cpu().numpy().astype(np.float64); class_ids = boxes.cls.cpu().numpy().astype(int)
+    except (AttributeError, IndexError, TypeError) as e: return score_range[0], 0.0, 0.0, 0
+    w = xyxy[:, 2] - xyxy[:, 0]; h = xyxy[:, 3] - xyxy[:, 1]; valid = (w > 0) & (h > 0)
+    areas = (w * h)[valid]
+    s_values = np.array([severity_map.get(names.get(c, f"class_{c}"), default_s_i) for c in class_ids[valid]], dtype=np.float64)
+    total_lesion_area = float(areas.sum()); sum_severity_points = float(s_values.sum())
+    sum_term = float(np.dot(s_values, areas)) / A; valid_detections = int(valid.sum())
     N = valid_detections
     if N == 0: return score_range[0], 0.0, 0.0, 0
     try:
@@ -107,8 +138,94 @@ def calculate_acneai_score(detection_results, image_shape, severity_map, default
     return score_S, percentage_affected_area, average_intensity, N
 
 
+def encode_heatmap_base64(heatmap_bgr, quality=DEFAULT_HEATMAP_ENCODE_QUALITY):
+    """
+    Encodes a BGR heatmap overlay as a base64 WebP string (see HEATMAP_MEDIA_TYPE).
+    Returns None if encoding fails.
+    """
+    success, buffer = cv2.imencode('.webp', heatmap_bgr, [cv2.IMWRITE_WEBP_QUALITY, quality])
+    if not success: return None
+    # b2a_base64 reads the encoded array through the buffer protocol, no intermediate bytes copy
+    return binascii.b2a_base64(buffer, newline=False).decode('ascii')
+
+
+def resize_image(image_bgr, size=DEFAULT_MODEL_INPUT_SIZE):
+    """
+    Resizes to (size, size), skipping the call when the image already has that shape.
+    INTER_AREA is used when shrinking (less aliasing, faster on large photos), INTER_LINEAR when enlarging.
+    """
+    h, w = image_bgr.shape[:2]
+    if (h, w) == (size, size): return image_bgr
+    interpolation = cv2.INTER_AREA if h * w > size * size else cv2.INTER_LINEAR
+    return cv2.resize(image_bgr, (size, size), interpolation=interpolation)
+
+
+# Per-thread pinned host buffer used to upload decoded frames to the GPU.
+# Capped at one 4096x4096 BGR frame (48MB), so page-locked memory stays below
+# executor threads x MAX_STAGING_BYTES; larger frames take a plain pageable copy.
+MAX_STAGING_BYTES = 4096 * 4096 * 3
+_staging = threading.local()
+
+
+def _upload_to_device(image, device):
+    """
+    Copies a uint8 array to `device` through a pinned host buffer that is reused
+    by the calling thread, so each request avoids a fresh pageable allocation.
+    The buffer only grows when a larger frame arrives, and never past MAX_STAGING_BYTES.
+    """
+    if image.nbytes > MAX_STAGING_BYTES:
+        return torch.from_numpy(np.ascontiguousarray(image)).to(device, non_blocking=True)
+    nbytes = image.nbytes; buffer = getattr(_staging, 'buffer', None)
+    if buffer is None or buffer.numel() < nbytes:
+        buffer = torch.empty(nbytes, dtype=torch.uint8, pin_memory=True)
+        _staging.buffer = buffer; _staging.event = torch.cuda.Event()
+    else:
+        _staging.event.synchronize() # Previous upload from this buffer must finish before it is overwritten
+    host = buffer[:nbytes].view(image.shape)
+    np.copyto(host.numpy(), image)
+    on_device = host.to(device, non_blocking=True)
+    _staging.event.record(torch.cuda.current_stream(device))
+    return on_device
+
+
+def prepare_model_input(image_bgr, device=None, size=DEFAULT_MODEL_INPUT_SIZE):
+    """
+    Resizes a decoded BGR image to the model input size.
+    On a CUDA device the image is uploaded once and resized there, so the
+    returned BCHW RGB float tensor can go straight into `model.predict`.
+    Returns: (model_input, resized_bgr) where resized_bgr is used for scoring and the heatmap.
+    """
+    if device is None or torch.device(device).type != 'cuda':
+        resized_bgr = resize_image(image_bgr, size)
+        return resized_bgr, resized_bgr
+
+    h, w = image_bgr.shape[:2]
+    # Only the resize touches the full-resolution frame; colour swap and scaling run on the small output
+    t = _upload_to_device(image_bgr, device).permute(2, 0, 1).unsqueeze(0).float()
+    if (h, w) == (size, size):
+        resized_bgr = image_bgr
+    else:
+        t = torch.nn.functional.interpolate(t, size=(size, size), mode='bilinear', align_corners=False, antialias=True)
+        resized_bgr = t[0].round().clamp_(0, 255).byte().permute(1, 2, 0).contiguous().cpu().numpy()
+    model_input = t.flip(1).div_(255.) # BGR -> RGB, 0-255 -> 0-1
+    return model_input, resized_bgr
+
+
+def load_model(model_path):
+    """
+    Loads the YOLOv8 model once so it can be shared across requests.
+    PyTorch weights are fused and moved to the GPU when one is available;
+    ONNX exports run through onnxruntime, which picks CUDA or CPU itself.
+    """
+    if model_path.endswith('.onnx'): return YOLO(model_path, task='detect')
+    model = YOLO(model_path)
+    model.fuse()
+    if torch.cuda.is_available(): model.to('cuda')
+    return model
+
+
 # --- Main Analysis Function ---
-def analyze_skin_image(model_path, image_path,
+def analyze_skin_image(model_path=None, image_path=None, image=None, model=None, predict_results=None,
                        conf_threshold=DEFAULT_CONFIDENCE_THRESHOLD,
                        severity_map=DEFAULT_SEVERITY_SCORE_MAP,
                        default_severity=DEFAULT_SEVERITY_SCORE,
@@ -121,8 +238,11 @@ def analyze_skin_image(model_path, image_path,
     formula, generates a heatmap, and returns the results.
 
     Args:
-        model_path (str): Path to the trained YOLOv8 model (.pt file).
-        image_path (str): Path to the input image file.
+        model_path (str): Path to the trained YOLOv8 model (.pt file). Ignored when `model` is given.
+        image_path (str): Path to the input image file. Ignored when `image` is given.
+        image (np.ndarray): Already decoded BGR image, skips reading from disk.
+        model (YOLO): Already loaded model (see `load_model`), skips loading per call.
+        predict_results (list): Prediction results already computed for `image`, skips prediction.
         conf_threshold (float): Confidence threshold for detection.
         severity_map (dict): Mapping of class names to severity scores (s_i for AcneAI).
         default_severity (int/float): Default severity score (s_i) for unmapped classes.
@@ -152,28 +272,38 @@ def analyze_skin_image(model_path, image_path,
     }
 
     # --- Validate Inputs ---
-    if not os.path.exists(model_path): results['message'] = f"Model file not found: {model_path}"; return results
-    if not os.path.exists(image_path): results['message'] = f"Image file not found: {image_path}"; return results
+    if model is None and (not model_path or not os.path.exists(model_path)): results['message'] = f"Model file not found: {model_path}"; return results
+    if image is None and (not image_path or not os.path.exists(image_path)): results['message'] = f"Image file not found: {image_path}"; return results
 
     try:
         # --- Load Model ---
-        print(f"--- Loading Model: {model_path} ---")
-        model = YOLO(model_path)
+        if model is None:
+            print(f"--- Loading Model: {model_path} ---")
+            model = YOLO(model_path)
         results['model_classes'] = getattr(model, 'names', {});
         if not isinstance(results['model_classes'], dict): results['model_classes'] = {}
-        print(f"Model loaded. Classes: {results['model_classes']}")
+        print(f"Model ready. Classes: {results['model_classes']}")
 
         # --- Read Image ---
-        print(f"\n--- Reading Image: {image_path} ---")
-        image_bgr = cv2.imread(image_path)
-        if image_bgr is None: raise IOError(f"Could not read image file: {image_path}")
+        if image is not None:
+            image_bgr = image
+        else:
+            print(f"\n--- Reading Image: {image_path} ---")
+            image_bgr = cv2.imread(image_path)
+            if image_bgr is None: raise IOError(f"Could not read image file: {image_path}")
         results['original_image_bgr'] = image_bgr.copy()
         original_shape = image_bgr.shape
         print(f"Image shape: {original_shape}")
 
         # --- Run Prediction ---
-        print(f"\n--- Running Prediction (Confidence: {conf_threshold}) ---")
-        predict_results = model.predict(source=image_path, conf=conf_threshold, save=False)
+        if predict_results is None:
+            print(f"\n--- Running Prediction (Confidence: {conf_threshold}) ---")
+            # Predict on the array already in memory so the file is read only once
+            predict_results = model.predict(source=image_bgr, conf=conf_threshold, save=False)
+
+        # Exported (ONNX) models only expose class names through their results
+        if not results['model_classes'] and predict_results and len(predict_results) > 0:
+            results['model_classes'] = dict(getattr(predict_results[0], 'names', None) or {})
 
         # --- Calculate Score using AcneAI Formula ---
         print("\n--- Calculating Severity Score (AcneAI Formula) ---")
@@ -209,13 +339,11 @@ def analyze_skin_image(model_path, image_path,
 
         # --- Extract Detections ---
         if predict_results and len(predict_results) > 0 and hasattr(predict_results[0], 'boxes') and len(predict_results[0].boxes) > 0:
-            names_map = results['model_classes']
-            for box in predict_results[0].boxes:
-                try:
-                    class_id = int(box.cls[0]); confidence = float(box.conf[0])
-                    class_name = names_map.get(class_id, f"class_{class_id}")
-                    results['detections'].append({'class_name': class_name, 'confidence': confidence})
-                except (AttributeError, IndexError, TypeError): continue
+            names_map = results['model_classes']; boxes = predict_results[0].boxes
+            try:
+                class_ids = boxes.cls.cpu().numpy().astype(int).tolist(); confidences = boxes.conf.cpu().numpy().astype(float).tolist()
+                results['detections'] = [{'class_name': names_map.get(c, f"class_{c}"), 'confidence': conf} for c, conf in zip(class_ids, confidences)]
+            except (AttributeError, IndexError, TypeError): pass
 
         results['success'] = True
         results['message'] = 'Analysis completed successfully using AcneAI score formula.'
@@ -240,7 +368,8 @@ if __name__ == "__main__":
     # Call the updated Analysis Function
     analysis_results = analyze_skin_image(
         model_path=example_model_path,
-   heatmap_sigma=DEFAULT_GAUSSIAN_SPREAD_SIGMA
+        image_path=example_image_path,
+        heatmap_sigma=DEFAULT_GAUSSIAN_SPREAD_SIGMA
     )
 
     # Process the Results
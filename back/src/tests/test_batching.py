@@ -0,0 +1,60 @@
+import asyncio
+import pytest
+import numpy as np
+import sys
+from pathlib import Path
+
+# Add the src directory to the Python path
+src_path = str(Path(__file__).parent.parent)
+if src_path not in sys.path:
+    sys.path.append(src_path)
+
+from src.api.core.batching import InferenceBatcher
+
+class FakeModel:
+    """Records the batch sizes it is called with and echoes the image mean"""
+    def __init__(self, fail=False):
+        self.batch_sizes = []
+        self.fail = fail
+
+    def predict(self, source, conf, verbose):
+        self.batch_sizes.append(len(source))
+        if self.fail:
+            raise RuntimeError("prediction failed")
+        return [float(image.mean()) for image in source]
+
+def run_batch(model, images, **kwargs):
+    async def _run():
+        batcher = InferenceBatcher(model, **kwargs)
+        batcher.start()
+        try:
+            return await asyncio.gather(*(batcher.submit(image) for image in images))
+        finally:
+            await batcher.stop()
+    return asyncio.run(_run())
+
+def test_concurrent_images_share_one_predict_call():
+    """Test that images submitted together are predicted as one batch"""
+    model = FakeModel()
+    images = [np.full((4, 4, 3), i, dtype=np.uint8) for i in range(3)]
+
+    results = run_batch(model, images, max_batch=8, max_wait=0.05)
+
+    assert model.batch_sizes == [3]
+    assert results == [[0.0], [1.0], [2.0]]
+
+def test_batch_size_is_capped():
+    """Test that batches never exceed max_batch"""
+    model = FakeModel()
+    images = [np.zeros((4, 4, 3), dtype=np.uint8) for _ in range(5)]
+
+    run_batch(model, images, max_batch=2, max_wait=0.05)
+
+    assert model.batch_sizes == [2, 2, 1]
+
+def test_prediction_error_is_propagated():
+    """Test that a failing predict call raises in every waiting request"""
+    model = FakeModel(fail=True)
+
+    with pytest.raises(RuntimeError):
+        run_batch(model, [np.zeros((4, 4, 3), dtype=np.uint8)])
@@ -0,0 +1,90 @@
+import sys
+from pathlib import Path
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from cachetools import LRUCache
+
+# Add the src directory to the Python path
+src_path = str(Path(__file__).parent.parent)
+if src_path not in sys.path:
+    sys.path.append(src_path)
+
+from src.api.routes import detection
+from src.api.models.schemas import DetectionResponse
+from src.api.config.settings import MAX_FILE_SIZE
+
+class FakeModel:
+    device = 'cpu'
+
+class FakeBatcher:
+    async def submit(self, image):
+        return []
+
+def make_client(monkeypatch, calls):
+    def fake_decode(content, device=None):
+        calls.append(bytes(content))
+        return content, content
+
+    def fake_build(model, image, predict_results):
+        return DetectionResponse(success=True, message="ok", lesion_count=len(calls))
+
+    monkeypatch.setattr(detection, '_decode_image', fake_decode)
+    monkeypatch.setattr(detection, '_build_response', fake_build)
+
+    app = FastAPI()
+    app.include_router(detection.router)
+    app.state.yolo = FakeModel()
+    app.state.batcher = FakeBatcher()
+    app.state.cache = LRUCache(maxsize=2)
+    return TestClient(app)
+
+def post_image(client, content):
+    return client.post("/detect/", files={"file": ("skin.jpg", content, "image/jpeg")})
+
+def test_identical_upload_is_served_from_cache(monkeypatch):
+    """Test that re-submitting the same bytes skips the pipeline"""
+    calls = []
+    client = make_client(monkeypatch, calls)
+
+    first = post_image(client, b"image-a")
+    second = post_image(client, b"image-a")
+
+    assert len(calls) == 1
+    assert first.status_code == second.status_code == 200
+    assert first.json() == second.json()
+
+def test_different_uploads_are_analyzed_separately(monkeypatch):
+    """Test that distinct images do not share a cache entry"""
+    calls = []
+    client = make_client(monkeypatch, calls)
+
+    first = post_image(client, b"image-a")
+    second = post_image(client, b"image-b")
+
+    assert calls == [b"image-a", b"image-b"]
+    assert first.json()['lesion_count'] == 1
+    assert second.json()['lesion_count'] == 2
+
+def test_oversized_upload_is_rejected(monkeypatch):
+    """Test that a body larger than MAX_FILE_SIZE gets 413 without being analyzed"""
+    calls = []
+    client = make_client(monkeypatch, calls)
+
+    response = post_image(client, b"0" * (MAX_FILE_SIZE + 1))
+
+    assert response.status_code == 413
+    assert calls == []
+
+def test_oversized_content_length_is_rejected(monkeypatch):
+    """Test that a declared Content-Length above the limit is rejected before reading"""
+    calls = []
+    client = make_client(monkeypatch, calls)
+
+    response = client.post(
+        "/detect/",
+        files={"file": ("skin.jpg", b"image-a", "image/jpeg")},
+        headers={"content-length": str(MAX_FILE_SIZE * 2)}
+    )
+
+    assert response.status_code == 413
+    assert calls == []
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+import sys
+from pathlib import Path
+from scipy.ndimage import gaussian_filter
+
+# Add the src directory to the Python path
+src_path = str(Path(__file__).parent.parent)
+if src_path not in sys.path:
+    sys.path.append(src_path)
+
+import src.detection.score as score
+from src.detection.score import _accumulate_heatmap, resize_image, _upload_to_device, MAX_STAGING_BYTES
+
+@pytest.mark.parametrize("img_h, img_w, sigma", [(640, 640, 90), (120, 80, 90), (64, 48, 3)])
+def test_accumulate_heatmap_matches_gaussian_filter(img_h, img_w, sigma):
+    """Test that the separable heatmap matches blurring a point image, borders included"""
+    rng = np.random.default_rng(0)
+    ys = rng.integers(0, img_h, 12)
+    xs = rng.integers(0, img_w, 12)
+    weights = rng.random(12)
+    # Force a duplicate point and points on the border
+    ys[:3] = [ys[0], 0, img_h - 1]
+    xs[:3] = [xs[0], img_w - 1, 0]
+
+    raw = np.zeros((img_h, img_w), dtype=np.float32)
+    np.add.at(raw, (ys, xs), weights)
+    expected = gaussian_filter(raw, sigma=sigma)
+
+    heatmap = _accumulate_heatmap(ys, xs, weights, img_h, img_w, sigma)
+
+    assert heatmap.shape == (img_h, img_w)
+    assert heatmap.dtype == np.float32
+    np.testing.assert_allclose(heatmap, expected, rtol=1e-4, atol=1e-6 * expected.max())
+
+def test_resize_image_skips_model_sized_input():
+    """Test that an image already at the model size is returned untouched"""
+    image = np.zeros((640, 640, 3), dtype=np.uint8)
+    assert resize_image(image, 640) is image
+
+@pytest.mark.parametrize("shape", [(2160, 3840, 3), (300, 200, 3)])
+def test_resize_image_output_shape(shape):
+    """Test that both downscaling and upscaling give a square model-sized image"""
+    image = np.zeros(shape, dtype=np.uint8)
+    assert resize_image(image, 640).shape == (640, 640, 3)
+
+def test_oversized_frame_bypasses_pinned_staging_buffer(monkeypatch):
+    """Test that frames above MAX_STAGING_BYTES never allocate the pinned buffer"""
+    monkeypatch.setattr(score, '_staging', score.threading.local())
+    image = np.ones((MAX_STAGING_BYTES // 3 + 1, 1, 3), dtype=np.uint8)
+
+    on_device = _upload_to_device(image, 'cpu')
+
+    assert getattr(score._staging, 'buffer', None) is None
+    assert tuple(on_device.shape) == image.shape
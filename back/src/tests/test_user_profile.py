@@ -1,4 +1,5 @@
 import sqlite3
+import asyncio
 import os
 import tempfile
 import pytest
@@ -12,7 +13,10 @@ if src_path not in sys.path:
     sys.path.append(src_path)
 
 # Import the database module
-from src.db.user_profile_db import init_db, save_profile_to_db, get_profile_from_db, ValidationError
+from src.db.user_profile_db import (
+    init_db, save_profile_to_db, get_profile_from_db, ValidationError,
+    create_async_connection, save_profile_async, get_profile_async
+)
 
 @pytest.fixture
 def temp_db():
@@ -178,4 +182,42 @@ def test_save_profile_with_invalid_data(temp_db):
             height=175.5,
             weight=-70.0,  # Negative value
             gender="Male"
-        ) 
\ No newline at end of file
+        )
+
+def test_async_save_and_get_profile(temp_db):
+    """Test saving and retrieving a profile through an async connection"""
+    test_profile = {
+        "user_id": "async_user_1",
+        "name": "Async User",
+        "dob": "1992-03-04",
+        "height": 168.0,
+        "weight": 60.5,
+        "gender": "Female"
+    }
+
+    async def roundtrip():
+        conn = await create_async_connection(temp_db)
+        try:
+            await save_profile_async(conn, **test_profile)
+            return await get_profile_async(conn, test_profile["user_id"])
+        finally:
+            await conn.close()
+
+    retrieved_profile = asyncio.run(roundtrip())
+
+    # The sync reader sees the committed row as well
+    assert retrieved_profile == test_profile
+    assert get_profile_from_db(test_profile["user_id"], db_path=temp_db) == test_profile
+
+def test_async_save_profile_with_invalid_data(temp_db):
+    """Test that the async save runs the same validation"""
+    async def save_invalid():
+        conn = await create_async_connection(temp_db)
+        try:
+            await save_profile_async(conn, user_id="", name="Test User", dob="2000-01-01",
+                                     height=175.5, weight=70.0, gender="Male")
+        finally:
+            await conn.close()
+
+    with pytest.raises(ValidationError):
+        asyncio.run(save_invalid())